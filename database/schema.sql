@@ -1,4 +1,11 @@
+-- Fresh install only: this drops all tables. Use upgrade.sql for existing databases.
 -- Drop tables if they exist (for clean deployment)
+IF OBJECT_ID('attachments_archive', 'U') IS NOT NULL
+    DROP TABLE attachments_archive;
+IF OBJECT_ID('emails_archive', 'U') IS NOT NULL
+    DROP TABLE emails_archive;
+IF OBJECT_ID('backfill_windows', 'U') IS NOT NULL
+    DROP TABLE backfill_windows;
 IF OBJECT_ID('attachments', 'U') IS NOT NULL
     DROP TABLE attachments;
 IF OBJECT_ID('emails', 'U') IS NOT NULL
@@ -16,7 +23,8 @@ CREATE TABLE emails (
     downloaded_date DATETIME DEFAULT GETDATE(),
     processed_date DATETIME NULL,
     deleted_date DATETIME NULL,
-    status VARCHAR(20) DEFAULT 'downloaded' -- downloaded, processed, deleted
+    status VARCHAR(20) DEFAULT 'downloaded', -- downloaded, processed, deleted
+    triage_action VARCHAR(20) DEFAULT 'ingest' -- ingest, headers (body and attachments not stored)
 );
 
 -- Create attachments table
@@ -29,8 +37,48 @@ CREATE TABLE attachments (
     FOREIGN KEY (message_id) REFERENCES emails(message_id)
 );
 
+-- Archive tier for processed emails moved out of the hot tables by the archive command.
+-- Columnstore with NVARCHAR(MAX) columns requires SQL Server 2017 or later.
+CREATE TABLE emails_archive (
+    message_id VARCHAR(255) NOT NULL,
+    sender VARCHAR(255) NOT NULL,
+    recipient VARCHAR(255) NOT NULL,
+    subject NVARCHAR(1000),
+    body NVARCHAR(MAX),
+    received_date DATETIME NOT NULL,
+    size INT,
+    downloaded_date DATETIME,
+    processed_date DATETIME NULL,
+    deleted_date DATETIME NULL,
+    status VARCHAR(20),
+    triage_action VARCHAR(20),
+    archived_date DATETIME DEFAULT GETDATE()
+);
+
+-- Attachment blobs do not compress in columnstore, so the archive stays rowstore clustered by email
+CREATE TABLE attachments_archive (
+    attachment_id UNIQUEIDENTIFIER PRIMARY KEY NONCLUSTERED,
+    message_id VARCHAR(255) NOT NULL,
+    file_name NVARCHAR(255) NOT NULL,
+    file_size INT,
+    file_data VARBINARY(MAX)
+);
+
+-- Track completed backfill windows so a backfill can be resumed
+CREATE TABLE backfill_windows (
+    window_id INT IDENTITY(1,1) PRIMARY KEY,
+    window_start DATETIME NOT NULL,
+    window_end DATETIME NOT NULL,
+    message_count INT NOT NULL,
+    completed_date DATETIME DEFAULT GETDATE()
+);
+
 -- Create indexes for better performance
 CREATE INDEX idx_emails_date ON emails(received_date);
 CREATE INDEX idx_emails_sender ON emails(sender);
-CREATE INDEX idx_emails_status ON emails(status);
-CREATE INDEX idx_attachments_messageid ON attachments(message_id);
\ No newline at end of file
+CREATE INDEX idx_emails_status_date ON emails(status, received_date);
+CREATE INDEX idx_attachments_messageid ON attachments(message_id);
+CREATE INDEX idx_backfill_windows_start ON backfill_windows(window_start);
+CREATE CLUSTERED COLUMNSTORE INDEX cci_emails_archive ON emails_archive;
+CREATE UNIQUE INDEX idx_emails_archive_messageid ON emails_archive(message_id);
+CREATE CLUSTERED INDEX idx_attachments_archive_messageid ON attachments_archive(message_id);
\ No newline at end of file
@@ -0,0 +1,62 @@
+-- Upgrade an existing database to the current schema without dropping data.
+-- Safe to run more than once; each step only runs if it is still needed.
+
+-- Record how triage stored each email (ingest, headers)
+IF COL_LENGTH('emails', 'triage_action') IS NULL
+    ALTER TABLE emails ADD triage_action VARCHAR(20) DEFAULT 'ingest' WITH VALUES;
+
+-- Archive tier for processed emails moved out of the hot tables by the archive command.
+-- Columnstore with NVARCHAR(MAX) columns requires SQL Server 2017 or later.
+IF OBJECT_ID('emails_archive', 'U') IS NULL
+    CREATE TABLE emails_archive (
+        message_id VARCHAR(255) NOT NULL,
+        sender VARCHAR(255) NOT NULL,
+        recipient VARCHAR(255) NOT NULL,
+        subject NVARCHAR(1000),
+        body NVARCHAR(MAX),
+        received_date DATETIME NOT NULL,
+        size INT,
+        downloaded_date DATETIME,
+        processed_date DATETIME NULL,
+        deleted_date DATETIME NULL,
+        status VARCHAR(20),
+        triage_action VARCHAR(20),
+        archived_date DATETIME DEFAULT GETDATE()
+    );
+
+IF COL_LENGTH('emails_archive', 'triage_action') IS NULL
+    ALTER TABLE emails_archive ADD triage_action VARCHAR(20) DEFAULT 'ingest' WITH VALUES;
+
+IF OBJECT_ID('attachments_archive', 'U') IS NULL
+    CREATE TABLE attachments_archive (
+        attachment_id UNIQUEIDENTIFIER PRIMARY KEY NONCLUSTERED,
+        message_id VARCHAR(255) NOT NULL,
+        file_name NVARCHAR(255) NOT NULL,
+        file_size INT,
+        file_data VARBINARY(MAX)
+    );
+
+-- Track completed backfill windows so a backfill can be resumed
+IF OBJECT_ID('backfill_windows', 'U') IS NULL
+    CREATE TABLE backfill_windows (
+        window_id INT IDENTITY(1,1) PRIMARY KEY,
+        window_start DATETIME NOT NULL,
+        window_end DATETIME NOT NULL,
+        message_count INT NOT NULL,
+        completed_date DATETIME DEFAULT GETDATE()
+    );
+
+-- idx_emails_status is superseded by idx_emails_status_date
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_emails_status_date' AND object_id = OBJECT_ID('emails'))
+    CREATE INDEX idx_emails_status_date ON emails(status, received_date);
+IF EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_emails_status' AND object_id = OBJECT_ID('emails'))
+    DROP INDEX idx_emails_status ON emails;
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_backfill_windows_start' AND object_id = OBJECT_ID('backfill_windows'))
+    CREATE INDEX idx_backfill_windows_start ON backfill_windows(window_start);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'cci_emails_archive' AND object_id = OBJECT_ID('emails_archive'))
+    CREATE CLUSTERED COLUMNSTORE INDEX cci_emails_archive ON emails_archive;
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_emails_archive_messageid' AND object_id = OBJECT_ID('emails_archive'))
+    CREATE UNIQUE INDEX idx_emails_archive_messageid ON emails_archive(message_id);
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'idx_attachments_archive_messageid' AND object_id = OBJECT_ID('attachments_archive'))
+    CREATE CLUSTERED INDEX idx_attachments_archive_messageid ON attachments_archive(message_id);
@@ -1,5 +1,7 @@
 import logging
+import time
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from msal import ConfidentialClientApplication
 
 def get_auth_headers(config):
@@ -38,42 +40,214 @@ def get_auth_headers(config):
         'Content-Type': 'application/json'
     }
 
-def get_emails(headers, config, limit=100, unread_only=True):
-    """Get unread emails from the inbox using Microsoft Graph API with pagination support."""
-    email_user = config['microsoft']['email_user']
-    all_emails = []
+def graph_get(headers, url, action, max_retries=5):
+    """GET a Microsoft Graph URL, retrying throttled requests.
     
-    # Build the initial URL with a filter for unread emails if needed
-    if unread_only:
-        next_link = f'https://graph.microsoft.com/v1.0/users/{email_user}/mailFolders/Inbox/messages?$filter=isRead eq false&$top={min(limit, 1000)}'
-    else:
-        next_link = f'https://graph.microsoft.com/v1.0/users/{email_user}/mailFolders/Inbox/messages?$top={min(limit, 1000)}'
+    Throttling (429) and transient errors (503, 504) are retried after the
+    server's Retry-After delay, or an exponential backoff if none is given.
     
-    while next_link and len(all_emails) < limit:
-        response = requests.get(next_link, headers=headers)
+    Args:
+        headers (dict): API request headers
+        url (str): Request URL
+        action (str): Description of the request used in log and error messages
+        max_retries (int): Retries before giving up on a throttled request
+        
+    Returns:
+        dict: Parsed JSON response
+        
+    Raises:
+        Exception: If the request does not succeed
+    """
+    retries = 0
+    while True:
+        response = requests.get(url, headers=headers)
+        
+        if response.status_code in (429, 503, 504) and retries < max_retries:
+            retries += 1
+            try:
+                wait_seconds = int(response.headers.get('Retry-After', 2 ** retries))
+            except ValueError:
+                wait_seconds = 2 ** retries
+            logging.warning(f"Throttled {action} ({response.status_code}), retrying in {wait_seconds}s")
+            time.sleep(wait_seconds)
+            continue
         
         if response.status_code != 200:
-            logging.error(f"Error getting emails: {response.status_code} - {response.text}")
-            break
-            
-        data = response.json()
-        emails = data.get('value', [])
+            raise Exception(f"Error {action}: {response.status_code} - {response.text}")
         
-        if not emails:
-            break
+        return response.json()
+
+def _build_messages_url(email_user, filters, page_size, select=None, expand=None, orderby=None):
+    """Build a Graph URL listing inbox messages.
+    
+    Args:
+        email_user (str): Mailbox address
+        filters (list): $filter clauses, combined with 'and'
+        page_size (int): Number of messages to request per page
+        select (str): Optional $select field list
+        expand (str): Optional $expand clause
+        orderby (str): Optional $orderby clause
+        
+    Returns:
+        str: Request URL
+    """
+    params = []
+    if filters:
+        params.append(f"$filter={' and '.join(filters)}")
+    if orderby:
+        params.append(f'$orderby={orderby}')
+    if select:
+        params.append(f'$select={select}')
+    if expand:
+        params.append(f'$expand={expand}')
+    params.append(f'$top={min(page_size, 1000)}')
+    return f"https://graph.microsoft.com/v1.0/users/{email_user}/mailFolders/Inbox/messages?{'&'.join(params)}"
+
+def _get_email_page(headers, link):
+    """Get one page of emails from a Graph messages link.
+    
+    Args:
+        headers (dict): API request headers
+        link (str): Graph request or @odata.nextLink URL
+        
+    Returns:
+        tuple: (list of email objects, next page link or None)
+        
+    Raises:
+        Exception: If the page cannot be retrieved
+    """
+    data = graph_get(headers, link, 'getting emails')
+    return data.get('value', []), data.get('@odata.nextLink')
+
+def iter_emails(headers, config, limit=100, unread_only=True, select=None, expand=None, extra_filter=None):
+    """Yield emails from the inbox page by page using Microsoft Graph API.
+    
+    The first request asks for no more than the limit, and the next page is
+    fetched in the background while the current page is being consumed. At
+    most two pages are held in memory at once. Graph's @odata.nextLink is
+    followed unchanged, so the final page is trimmed to the limit here.
+    
+    Args:
+        headers (dict): API request headers
+        config (dict): Configuration settings
+        limit (int): Maximum number of emails to yield
+        unread_only (bool): Only yield unread emails
+        select (str): Optional $select field list
+        expand (str): Optional $expand clause
+        extra_filter (str): Optional $filter clause added to the unread filter
+        
+    Yields:
+        dict: Email objects from the API
+        
+    Raises:
+        Exception: If a page cannot be retrieved
+    """
+    email_user = config['microsoft']['email_user']
+    
+    # Build the initial URL with a filter for unread emails if needed
+    filters = ['isRead eq false'] if unread_only else []
+    if extra_filter:
+        filters.append(extra_filter)
+    link = _build_messages_url(email_user, filters, limit, select=select, expand=expand)
+    
+    remaining = limit
+    executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        next_page = executor.submit(_get_email_page, headers, link) if remaining > 0 else None
+        while next_page:
+            emails, next_link = next_page.result()
+            emails = emails[:remaining]
+            remaining -= len(emails)
+            
+            # Start fetching the following page before handing this one out
+            next_page = None
+            if emails and next_link and remaining > 0:
+                next_page = executor.submit(_get_email_page, headers, next_link)
             
-        all_emails.extend(emails)
+            for email in emails:
+                yield email
+    finally:
+        executor.shutdown(wait=False)
+
+def get_emails_in_window(headers, config, start, end, page_size=100, max_retries=5,
+                         select=None, expand=None, extra_filter=None):
+    """Get all inbox emails received within a date window, oldest first.
+
+    Args:
+        headers (dict): API request headers
+        config (dict): Configuration settings
+        start (datetime): Window start (inclusive, UTC)
+        end (datetime): Window end (exclusive, UTC)
+        page_size (int): Number of messages to request per page
+        max_retries (int): Retries per page when Graph throttles the request
+        select (str): Optional $select field list
+        expand (str): Optional $expand clause
+        extra_filter (str): Optional $filter clause added to the window filter
+
+    Returns:
+        list: Email objects from the API
+
+    Raises:
+        Exception: If a page cannot be retrieved
+    """
+    email_user = config['microsoft']['email_user']
+    # Graph requires the $orderby property to lead the $filter
+    filters = [
+        f"receivedDateTime ge {start.strftime('%Y-%m-%dT%H:%M:%SZ')}",
+        f"receivedDateTime lt {end.strftime('%Y-%m-%dT%H:%M:%SZ')}",
+    ]
+    if extra_filter:
+        filters.append(extra_filter)
+    next_link = _build_messages_url(
+        email_user, filters, page_size, select=select, expand=expand, orderby='receivedDateTime asc'
+    )
+    window_emails = []
+
+    while next_link:
+        data = graph_get(headers, next_link, 'getting emails', max_retries=max_retries)
+        window_emails.extend(data.get('value', []))
         next_link = data.get('@odata.nextLink')
+
+    return window_emails
+
+def get_email_body(headers, config, msg_id):
+    """Get the body of a specific email.
+    
+    Used when emails were listed with a $select that left the body out.
     
-    if not all_emails:
-        if unread_only:
-            logging.warning("No unread emails found in inbox.")
-        else:
-            logging.warning("No emails found in inbox.")
-        return []
+    Args:
+        headers (dict): API request headers
+        config (dict): Configuration settings
+        msg_id (str): Message ID
+        
+    Returns:
+        str: Body content
+        
+    Raises:
+        Exception: If the body cannot be retrieved
+    """
+    email_user = config['microsoft']['email_user']
+    body_url = f"https://graph.microsoft.com/v1.0/users/{email_user}/messages/{msg_id}?$select=body"
+    return graph_get(headers, body_url, 'getting email body').get('body', {}).get('content', '')
 
-    logging.info(f"Found {len(all_emails)} {'unread ' if unread_only else ''}emails in inbox.")
-    return all_emails[:limit]
+def get_attachment(headers, config, msg_id, attachment_id):
+    """Get a single attachment, including its content, for a specific email.
+    
+    Args:
+        headers (dict): API request headers
+        config (dict): Configuration settings
+        msg_id (str): Message ID
+        attachment_id (str): Attachment ID
+        
+    Returns:
+        dict: Attachment object from the API
+        
+    Raises:
+        Exception: If the attachment cannot be retrieved
+    """
+    email_user = config['microsoft']['email_user']
+    attach_url = f"https://graph.microsoft.com/v1.0/users/{email_user}/messages/{msg_id}/attachments/{attachment_id}"
+    return graph_get(headers, attach_url, 'getting attachment')
 
 def get_attachments(headers, config, msg_id):
     """Get attachments for a specific email.
@@ -85,17 +259,13 @@ def get_attachments(headers, config, msg_id):
         
     Returns:
         list: Attachment objects from the API
+        
+    Raises:
+        Exception: If the attachments cannot be retrieved
     """
     email_user = config['microsoft']['email_user']
     attach_url = f"https://graph.microsoft.com/v1.0/users/{email_user}/messages/{msg_id}/attachments"
-    attach_response = requests.get(attach_url, headers=headers)
-    
-    if attach_response.status_code != 200:
-        logging.error(f"Error getting attachments: {attach_response.status_code} - {attach_response.text}")
-        return []
-        
-    attachments = attach_response.json().get('value', [])
-    return attachments
+    return graph_get(headers, attach_url, 'getting attachments').get('value', [])
 
 def mark_as_read(headers, config, msg_id):
     """Mark an email as read in Outlook.
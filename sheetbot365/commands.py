@@ -1,17 +1,111 @@
 import logging
 import pymssql
 import base64
-from sheetbot365.utils import create_lock, remove_lock
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from sheetbot365.utils import create_lock, remove_lock, get_uncovered_ranges
 from sheetbot365.api import (
-    get_auth_headers, get_emails, get_attachments, 
-    mark_as_read, delete_email_from_inbox
+    get_auth_headers, iter_emails, get_emails_in_window, get_email_body,
+    get_attachment, get_attachments, mark_as_read, delete_email_from_inbox
 )
+from sheetbot365.triage import compile_triage, triage_email, attachment_matches
 from sheetbot365.database import (
-    insert_email, insert_attachment, update_email_status,
+    check_email_exists, insert_email, insert_attachment, update_email_status,
     mark_emails_deleted, delete_emails_from_db,
-    get_emails_to_delete_from_inbox, get_email_status_counts
+    get_emails_to_delete_from_inbox, get_email_status_counts,
+    get_completed_backfill_windows, record_backfill_window,
+    get_email_statistics, archive_emails_batch
 )
 
+def process_email(cursor, headers, config, email, mark_read=True, triage=None):
+    """Store an email and its file attachments in the database.
+    
+    Args:
+        cursor: Database cursor
+        headers (dict): API request headers
+        config (dict): Configuration settings
+        email (dict): Email object from the API
+        mark_read (bool): Whether to mark the email as read in Outlook
+        triage (dict): Compiled triage rules deciding what to store, or None to store everything
+        
+    Returns:
+        bool: True if the email was inserted, False if it already existed or was skipped
+    """
+    msg_id = email.get('id')
+    sender = email.get('from', {}).get('emailAddress', {}).get('address', '')
+    recipient = config['microsoft']['email_user']
+    subject = email.get('subject', '')
+    received_date = email.get('receivedDateTime', '')
+    size = email.get('size', 0)
+
+    action = triage_email(triage, email)
+    if action == 'skip':
+        logging.info(f"Skipping email by triage rules: {subject}")
+        if mark_read:
+            mark_as_read(headers, config, msg_id)
+        return False
+
+    # Skip duplicates before spending any more Graph requests on them
+    if check_email_exists(cursor, msg_id):
+        logging.info(f"Skipping duplicate email (message_id: {msg_id}): {subject}")
+        # Still mark as read even if email exists
+        if mark_read:
+            mark_as_read(headers, config, msg_id)
+        return False
+
+    # Triage listings leave the body out, so fetch it only for mail being ingested
+    if action == 'headers':
+        body = ''
+    elif 'body' in email:
+        body = email.get('body', {}).get('content', '')
+    else:
+        body = get_email_body(headers, config, msg_id)
+
+    # Insert email if it doesn't exist
+    email_inserted = insert_email(
+        cursor, msg_id, sender, recipient, subject, body, received_date, size, triage_action=action
+    )
+    
+    # Skip attachment processing if email already exists
+    if not email_inserted:
+        logging.info(f"Skipping attachments for duplicate email: {subject}")
+        # Still mark as read even if email exists
+        if mark_read:
+            mark_as_read(headers, config, msg_id)
+        return False
+
+    # Process attachments
+    if action == 'headers':
+        attachments = []
+    elif triage and triage['attachments']:
+        # Download only the attachments the triage rules want to keep
+        attachments = []
+        for meta in email.get('attachments', []):
+            if attachment_matches(triage['attachments'], meta):
+                attachments.append(get_attachment(headers, config, msg_id, meta['id']))
+    else:
+        attachments = get_attachments(headers, config, msg_id)
+    logging.info(f"Found {len(attachments)} attachments")
+
+    for attachment in attachments:
+        if attachment.get('@odata.type') == '#microsoft.graph.fileAttachment':
+            file_name = attachment['name']
+            file_size = attachment['size']
+            
+            try:
+                file_data = base64.b64decode(attachment['contentBytes'])
+                insert_attachment(cursor, msg_id, file_name, file_size, file_data)
+            except Exception as attach_err:
+                logging.error(f"Error processing attachment {file_name}: {attach_err}")
+
+    # Mark email as processed in our system
+    update_email_status(cursor, msg_id, 'processed')
+    
+    # Mark as read in Microsoft Graph
+    if mark_read:
+        mark_as_read(headers, config, msg_id)
+    return True
+
 def cmd_scan(config, args):
     """Scan for new emails and add them to the database.
     
@@ -22,6 +116,9 @@ def cmd_scan(config, args):
     create_lock(config)
     
     try:
+        # Compile triage rules once for the whole scan
+        triage = compile_triage(config.get('triage'))
+        
         # Get authentication headers
         headers = get_auth_headers(config)
         logging.info("Connected to Microsoft Graph API")
@@ -42,76 +139,185 @@ def cmd_scan(config, args):
                 current_time = cursor.fetchone()[0]
                 logging.info(f"Database connection successful! Server time: {current_time}")
         
-        # Get unread emails
-        unread_emails = get_emails(headers, config, limit=limit, unread_only=True)
-        
-        if not unread_emails:
-            logging.info("No unread emails to process.")
-            remove_lock(config)
-            return
-        
-        # Process emails
+        # Process unread emails as each page arrives. Marking them as read is
+        # deferred until the stream is exhausted, since changing isRead while
+        # paging an isRead filter would shift later pages.
+        processed_ids = []
+        failed_count = 0
+        emails_seen = 0
         with pymssql.connect(**db_config) as conn:
             with conn.cursor() as cursor:
-                for idx, email in enumerate(unread_emails, start=1):
+                unread_emails = iter_emails(
+                    headers, config, limit=limit, unread_only=True,
+                    select=triage['select'] if triage else None,
+                    expand=triage['expand'] if triage else None,
+                    extra_filter=triage['filter'] if triage else None
+                )
+                for email in unread_emails:
+                    emails_seen += 1
+                    # Savepoint per email, so a failure part way through (e.g. an attachment
+                    # fetch) doesn't commit a half-stored row the next scan would see as a duplicate
+                    cursor.execute("SAVE TRANSACTION scan_email")
                     try:
-                        msg_id = email.get('id')
                         sender = email.get('from', {}).get('emailAddress', {}).get('address', '')
-                        recipient = config['microsoft']['email_user']
-                        subject = email.get('subject', '')
-                        body = email.get('body', {}).get('content', '')
-                        received_date = email.get('receivedDateTime', '')
-                        size = email.get('size', 0)
-
-                        logging.info(f"Processing {idx} of {len(unread_emails)}: {subject} from {sender}")
-
-                        # Insert email if it doesn't exist
-                        email_inserted = insert_email(
-                            cursor, msg_id, sender, recipient, subject, body, received_date, size
-                        )
-                        
-                        # Skip attachment processing if email already exists
-                        if not email_inserted:
-                            logging.info(f"Skipping attachments for duplicate email: {subject}")
-                            # Still mark as read even if email exists
-                            mark_as_read(headers, config, msg_id)
-                            continue
-
-                        # Process attachments
-                        attachments = get_attachments(headers, config, msg_id)
-                        logging.info(f"Found {len(attachments)} attachments")
-
-                        for attachment in attachments:
-                            if attachment.get('@odata.type') == '#microsoft.graph.fileAttachment':
-                                file_name = attachment['name']
-                                file_size = attachment['size']
-                                
-                                try:
-                                    file_data = base64.b64decode(attachment['contentBytes'])
-                                    insert_attachment(cursor, msg_id, file_name, file_size, file_data)
-                                except Exception as attach_err:
-                                    logging.error(f"Error processing attachment {file_name}: {attach_err}")
-
-                        # Mark email as processed in our system
-                        update_email_status(cursor, msg_id, 'processed')
-                        
-                        # Mark as read in Microsoft Graph
-                        mark_as_read(headers, config, msg_id)
-                    
+                        logging.info(f"Processing {emails_seen} of up to {limit}: {email.get('subject', '')} from {sender}")
+                        process_email(cursor, headers, config, email, mark_read=False, triage=triage)
+                        processed_ids.append(email.get('id'))
                     except Exception as email_err:
+                        cursor.execute("ROLLBACK TRANSACTION scan_email")
+                        failed_count += 1
                         logging.error(f"Error processing email: {email_err}")
                         continue
 
+                if not emails_seen:
+                    logging.info("No unread emails to process.")
+                    return
+
+                if failed_count:
+                    logging.error(f"Failed to process {failed_count} of {emails_seen} emails; they were rolled back and left unread for the next scan")
+
                 # After processing all emails, mark old processed emails as deleted
                 if args.auto_mark_deleted:
                     deleted_count = mark_emails_deleted(cursor, days_old=days_old)
                 
                 conn.commit()
                 
-                # Show summary
-                status_counts = get_email_status_counts(cursor)
+                # Mark as read in Microsoft Graph now that the emails are committed
+                for msg_id in processed_ids:
+                    mark_as_read(headers, config, msg_id)
+                
+                # Show summary (hot tier only, so the scan cost doesn't grow with the archive)
+                status_counts = get_email_status_counts(cursor, include_archive=False)
                 logging.info(f"Email status counts: {status_counts}")
-                logging.info("All emails processed and committed.")
+                logging.info(f"Processed and committed {len(processed_ids)} of {emails_seen} emails.")
+    
+    except Exception as e:
+        logging.exception(f"Error occurred: {e}")
+    finally:
+        remove_lock(config)
+
+def backfill_window(config, window_start, window_end, page_size, triage=None):
+    """Ingest every email in one backfill window and record the window as done.
+    
+    Runs in a worker thread, so it opens its own API token and database connection.
+    If any email in the window fails, the window is rolled back and not recorded,
+    so the next run fetches it again.
+    
+    Args:
+        config (dict): Configuration settings
+        window_start (datetime): Window start
+        window_end (datetime): Window end
+        page_size (int): Number of messages to request per page
+        triage (dict): Compiled triage rules, or None to store everything
+        
+    Returns:
+        int: Number of emails found in the window
+        
+    Raises:
+        Exception: If any email in the window could not be processed
+    """
+    headers = get_auth_headers(config)
+    emails = get_emails_in_window(
+        headers, config, window_start, window_end, page_size=page_size,
+        select=triage['select'] if triage else None,
+        expand=triage['expand'] if triage else None,
+        extra_filter=triage['filter'] if triage else None
+    )
+    
+    with pymssql.connect(**config['database']) as conn:
+        with conn.cursor() as cursor:
+            failed = 0
+            for email in emails:
+                try:
+                    process_email(cursor, headers, config, email, mark_read=False, triage=triage)
+                except Exception as email_err:
+                    failed += 1
+                    logging.error(f"Error processing email: {email_err}")
+            
+            if failed:
+                conn.rollback()
+                raise Exception(f"{failed} of {len(emails)} emails failed, window rolled back")
+            
+            record_backfill_window(cursor, window_start, window_end, len(emails))
+            conn.commit()
+    
+    return len(emails)
+
+def cmd_backfill(config, args):
+    """Ingest historical inbox emails between two dates using parallel date windows.
+    
+    The range is split into receivedDateTime windows which are paged concurrently.
+    Window size adapts to the message density of the windows already completed,
+    and completed windows are recorded so an interrupted backfill can be resumed.
+    
+    Args:
+        config (dict): Configuration settings
+        args (Namespace): Command line arguments
+    """
+    create_lock(config)
+    
+    try:
+        triage = compile_triage(config.get('triage'))
+        backfill_defaults = config.get('defaults', {}).get('backfill', {})
+        workers = args.workers if args.workers is not None else backfill_defaults.get('workers', 4)
+        page_size = backfill_defaults.get('page_size', 100)
+        target_per_window = backfill_defaults.get('target_per_window', 1000)
+        min_window = timedelta(minutes=backfill_defaults.get('min_window_minutes', 15))
+        max_window = timedelta(days=backfill_defaults.get('max_window_days', 30))
+        window_size = timedelta(hours=backfill_defaults.get('initial_window_hours', 24))
+        
+        since, until = args.since, args.until
+        if since >= until:
+            raise ValueError("--since must be earlier than --until")
+        
+        # Work out which parts of the range still need to be fetched
+        with pymssql.connect(**config['database']) as conn:
+            with conn.cursor() as cursor:
+                completed = get_completed_backfill_windows(cursor, since, until)
+        gaps = get_uncovered_ranges(since, until, completed)
+        
+        if not gaps:
+            logging.info(f"Backfill of {since} - {until} already complete.")
+            return
+        
+        logging.info(f"Backfilling {len(gaps)} range(s) between {since} and {until} with {workers} workers")
+        
+        total_emails = 0
+        failed_windows = 0
+        pending = {}
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while gaps or pending:
+                # Keep every worker busy with the next window of the current size
+                while gaps and len(pending) < workers:
+                    gap_start, gap_end = gaps[0]
+                    window_end = min(gap_start + window_size, gap_end)
+                    if window_end >= gap_end:
+                        gaps.pop(0)
+                    else:
+                        gaps[0] = (window_end, gap_end)
+                    future = executor.submit(backfill_window, config, gap_start, window_end, page_size, triage)
+                    pending[future] = (gap_start, window_end)
+                
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window_start, window_end = pending.pop(future)
+                    try:
+                        count = future.result()
+                    except Exception as window_err:
+                        failed_windows += 1
+                        logging.error(f"Backfill window {window_start} - {window_end} failed: {window_err}")
+                        continue
+                    
+                    total_emails += count
+                    
+                    # Resize windows so each holds roughly target_per_window messages
+                    window_size = (window_end - window_start) * target_per_window / max(count, 1)
+                    window_size = max(min_window, min(max_window, window_size))
+        
+        logging.info(f"Backfill finished: {total_emails} emails found, {failed_windows} window(s) failed")
+        if failed_windows:
+            logging.warning("Re-run the same backfill command to retry failed windows.")
     
     except Exception as e:
         logging.exception(f"Error occurred: {e}")
@@ -162,6 +368,51 @@ def cmd_delete(config, args):
     finally:
         remove_lock(config)
 
+def cmd_archive(config, args):
+    """Move old processed emails and their attachments to the archive tier.
+    
+    Rows are moved in batches, each committed separately, so the hot tables
+    stay available and an interrupted run keeps the work already done.
+    
+    Args:
+        config (dict): Configuration settings
+        args (Namespace): Command line arguments
+    """
+    create_lock(config)
+    
+    try:
+        # Database connection parameters
+        db_config = config['database']
+        
+        # Get days_old and batch_size from args or config
+        archive_defaults = config.get('defaults', {}).get('archive', {})
+        days_old = args.days_old if args.days_old is not None else archive_defaults.get('days_old', 180)
+        batch_size = args.batch_size if args.batch_size is not None else archive_defaults.get('batch_size', 5000)
+        if batch_size <= 0:
+            raise ValueError(f"Archive batch size must be positive, got: {batch_size}")
+        if days_old < 0:
+            raise ValueError(f"Archive days old must not be negative, got: {days_old}")
+        
+        total_emails = 0
+        total_attachments = 0
+        with pymssql.connect(**db_config) as conn:
+            with conn.cursor() as cursor:
+                while True:
+                    emails_archived, attachments_archived = archive_emails_batch(
+                        cursor, days_old=days_old, batch_size=batch_size
+                    )
+                    conn.commit()
+                    total_emails += emails_archived
+                    total_attachments += attachments_archived
+                    if emails_archived < batch_size:
+                        break
+        
+        logging.info(f"Archived {total_emails} emails and {total_attachments} attachments older than {days_old} days")
+    except Exception as e:
+        logging.exception(f"Error occurred: {e}")
+    finally:
+        remove_lock(config)
+
 def cmd_status(config, args):
     """Show email status counts.
     
@@ -184,22 +435,16 @@ def cmd_status(config, args):
                 
                 # Get additional statistics if verbose
                 if args.verbose:
-                    cursor.execute("""
-                        SELECT 
-                            COUNT(*) as total,
-                            MIN(received_date) as oldest,
-                            MAX(received_date) as newest,
-                            COUNT(DISTINCT sender) as unique_senders
-                        FROM emails
-                    """)
-                    stats = cursor.fetchone()
+                    stats = get_email_statistics(cursor)
                     
                     print("Additional Statistics:")
                     print("======================")
-                    print(f"Total emails: {stats[0]}")
-                    print(f"Oldest email: {stats[1]}")
-                    print(f"Newest email: {stats[2]}")
-                    print(f"Unique senders: {stats[3]}")
+                    print(f"Total emails: {stats['total']}")
+                    print(f"Hot emails: {stats['hot']}")
+                    print(f"Archived emails: {stats['archived']}")
+                    print(f"Oldest email: {stats['oldest']}")
+                    print(f"Newest email: {stats['newest']}")
+                    print(f"Unique senders: {stats['unique_senders']}")
                     print()
     except Exception as e:
         logging.exception(f"Error occurred: {e}")
\ No newline at end of file
@@ -1,8 +1,16 @@
 import logging
 
+# (emails table, attachments table) for the hot and archive tiers
+EMAIL_TIERS = (
+    ('emails', 'attachments'),
+    ('emails_archive', 'attachments_archive'),
+)
+
 def check_email_exists(cursor, msg_id):
     """Check if an email with the given message ID already exists in the database.
     
+    Both the hot and archive tiers are checked, so archived emails are not re-ingested.
+    
     Args:
         cursor: Database cursor
         msg_id (str): Message ID to check
@@ -11,12 +19,13 @@ def check_email_exists(cursor, msg_id):
         bool: True if the email exists, False otherwise
     """
     cursor.execute("""
-        SELECT COUNT(*) FROM emails WHERE message_id = %s
-    """, (msg_id,))
-    count = cursor.fetchone()[0]
-    return count > 0
+        SELECT CASE WHEN EXISTS (SELECT 1 FROM emails WHERE message_id = %s)
+                      OR EXISTS (SELECT 1 FROM emails_archive WHERE message_id = %s)
+               THEN 1 ELSE 0 END
+    """, (msg_id, msg_id))
+    return cursor.fetchone()[0] == 1
 
-def insert_email(cursor, msg_id, sender, recipient, subject, body, received_date, size):
+def insert_email(cursor, msg_id, sender, recipient, subject, body, received_date, size, triage_action='ingest'):
     """Insert a new email if it doesn't already exist.
     
     Args:
@@ -28,6 +37,7 @@ def insert_email(cursor, msg_id, sender, recipient, subject, body, received_date
         body (str): Email body content
         received_date (str): Date the email was received
         size (int): Email size in bytes
+        triage_action (str): How triage stored the email ('ingest' or 'headers')
         
     Returns:
         bool: True if inserted, False if already exists
@@ -39,10 +49,10 @@ def insert_email(cursor, msg_id, sender, recipient, subject, body, received_date
     cursor.execute("""
         INSERT INTO emails (
             message_id, sender, recipient, subject, body, received_date, size, 
-            downloaded_date, status
+            downloaded_date, status, triage_action
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, GETDATE(), 'downloaded')
-    """, (msg_id, sender, recipient, subject, body, received_date, size))
+        VALUES (%s, %s, %s, %s, %s, %s, %s, GETDATE(), 'downloaded', %s)
+    """, (msg_id, sender, recipient, subject, body, received_date, size, triage_action))
     logging.info(f"Inserted email: {subject} with status 'downloaded'")
     return True
 
@@ -88,6 +98,8 @@ def update_email_status(cursor, msg_id, status):
 def mark_emails_deleted(cursor, days_old=30):
     """Mark emails as deleted if they are older than the specified number of days.
     
+    Covers both the hot and archive tiers.
+    
     Args:
         cursor: Database cursor
         days_old (int): Number of days threshold
@@ -95,14 +107,16 @@ def mark_emails_deleted(cursor, days_old=30):
     Returns:
         int: Number of emails marked as deleted
     """
-    cursor.execute("""
-        UPDATE emails
-        SET status = 'deleted', deleted_date = GETDATE()
-        WHERE status = 'processed'
-          AND processed_date < DATEADD(day, -%s, GETDATE())
-          AND deleted_date IS NULL
-    """, (days_old,))
-    rows_affected = cursor.rowcount
+    rows_affected = 0
+    for emails_table, _ in EMAIL_TIERS:
+        cursor.execute(f"""
+            UPDATE {emails_table}
+            SET status = 'deleted', deleted_date = GETDATE()
+            WHERE status = 'processed'
+              AND processed_date < DATEADD(day, -%s, GETDATE())
+              AND deleted_date IS NULL
+        """, (days_old,))
+        rows_affected += cursor.rowcount
     if rows_affected > 0:
         logging.info(f"Marked {rows_affected} emails as 'deleted'")
     return rows_affected
@@ -110,6 +124,8 @@ def mark_emails_deleted(cursor, days_old=30):
 def delete_emails_from_db(cursor, days_old=90):
     """Permanently delete emails from database that have been in 'deleted' status for more than X days.
     
+    Covers both the hot and archive tiers.
+    
     Args:
         cursor: Database cursor
         days_old (int): Number of days threshold
@@ -117,25 +133,29 @@ def delete_emails_from_db(cursor, days_old=90):
     Returns:
         tuple: (number of emails deleted, number of attachments deleted)
     """
-    # First, delete the attachments
-    cursor.execute("""
-        DELETE FROM attachments
-        WHERE message_id IN (
-            SELECT message_id FROM emails
+    emails_deleted = 0
+    attachments_deleted = 0
+    for emails_table, attachments_table in EMAIL_TIERS:
+        # First, delete the attachments
+        cursor.execute(f"""
+            DELETE FROM {attachments_table}
+            WHERE message_id IN (
+                SELECT message_id FROM {emails_table}
+                WHERE status = 'deleted'
+                AND DATEDIFF(day, deleted_date, GETDATE()) > %s
+            )
+        """, (days_old,))
+        attachments_deleted += cursor.rowcount
+        
+        # Then, delete the emails
+        cursor.execute(f"""
+            DELETE FROM {emails_table}
             WHERE status = 'deleted'
             AND DATEDIFF(day, deleted_date, GETDATE()) > %s
-        )
-    """, (days_old,))
-    attachments_deleted = cursor.rowcount
-    logging.info(f"Deleted {attachments_deleted} attachments from database")
+        """, (days_old,))
+        emails_deleted += cursor.rowcount
     
-    # Then, delete the emails
-    cursor.execute("""
-        DELETE FROM emails
-        WHERE status = 'deleted'
-        AND DATEDIFF(day, deleted_date, GETDATE()) > %s
-    """, (days_old,))
-    emails_deleted = cursor.rowcount
+    logging.info(f"Deleted {attachments_deleted} attachments from database")
     logging.info(f"Deleted {emails_deleted} emails from database")
     
     return emails_deleted, attachments_deleted
@@ -143,6 +163,8 @@ def delete_emails_from_db(cursor, days_old=90):
 def get_emails_to_delete_from_inbox(cursor, days_old=90):
     """Get list of emails that should be deleted from inbox.
     
+    Covers both the hot and archive tiers.
+    
     Args:
         cursor: Database cursor
         days_old (int): Number of days threshold
@@ -154,28 +176,158 @@ def get_emails_to_delete_from_inbox(cursor, days_old=90):
         SELECT message_id FROM emails
         WHERE status = 'deleted'
         AND DATEDIFF(day, deleted_date, GETDATE()) > %s
-    """, (days_old,))
+        UNION ALL
+        SELECT message_id FROM emails_archive
+        WHERE status = 'deleted'
+        AND DATEDIFF(day, deleted_date, GETDATE()) > %s
+    """, (days_old, days_old))
     return [row[0] for row in cursor.fetchall()]
 
-def get_email_status_counts(cursor):
+def get_email_status_counts(cursor, include_archive=True):
     """Get counts of emails in each status.
     
     Args:
         cursor: Database cursor
+        include_archive (bool): Include emails in the archive tier
         
     Returns:
         dict: Status counts with status as key and count as value
     """
-    cursor.execute("""
-        SELECT status, COUNT(*) as count
-        FROM emails
-        GROUP BY status
-        ORDER BY status
-    """)
+    if include_archive:
+        cursor.execute("""
+            SELECT status, SUM(count) as count
+            FROM (
+                SELECT status, COUNT(*) as count FROM emails GROUP BY status
+                UNION ALL
+                SELECT status, COUNT(*) as count FROM emails_archive GROUP BY status
+            ) tiers
+            GROUP BY status
+            ORDER BY status
+        """)
+    else:
+        cursor.execute("""
+            SELECT status, COUNT(*) as count
+            FROM emails
+            GROUP BY status
+            ORDER BY status
+        """)
     results = cursor.fetchall()
     
     stats = {}
     for status, count in results:
         stats[status] = count
         
-    return stats
\ No newline at end of file
+    return stats
+
+def get_email_statistics(cursor):
+    """Get summary statistics across the hot and archive tiers.
+    
+    Args:
+        cursor: Database cursor
+        
+    Returns:
+        dict: Keys total, hot, archived, oldest, newest and unique_senders
+    """
+    cursor.execute("""
+        SELECT 
+            COUNT(*) as total,
+            SUM(CASE WHEN tier = 'hot' THEN 1 ELSE 0 END) as hot,
+            SUM(CASE WHEN tier = 'archive' THEN 1 ELSE 0 END) as archived,
+            MIN(received_date) as oldest,
+            MAX(received_date) as newest,
+            COUNT(DISTINCT sender) as unique_senders
+        FROM (
+            SELECT 'hot' as tier, received_date, sender FROM emails
+            UNION ALL
+            SELECT 'archive' as tier, received_date, sender FROM emails_archive
+        ) tiers
+    """)
+    row = cursor.fetchone()
+    return {
+        'total': row[0],
+        'hot': row[1] or 0,
+        'archived': row[2] or 0,
+        'oldest': row[3],
+        'newest': row[4],
+        'unique_senders': row[5],
+    }
+
+def archive_emails_batch(cursor, days_old=180, batch_size=5000):
+    """Move one batch of old processed emails and their attachments to the archive tier.
+    
+    Args:
+        cursor: Database cursor
+        days_old (int): Only archive emails received more than this many days ago
+        batch_size (int): Maximum number of emails to move
+        
+    Returns:
+        tuple: (number of emails archived, number of attachments archived)
+    """
+    cursor.execute("""
+        SET NOCOUNT ON;
+        DECLARE @batch TABLE (message_id VARCHAR(255) PRIMARY KEY);
+        DECLARE @emails INT, @attachments INT;
+
+        INSERT INTO @batch (message_id)
+        SELECT TOP (%s) message_id FROM emails
+        WHERE status = 'processed'
+          AND received_date < DATEADD(day, -%s, GETDATE())
+        ORDER BY received_date;
+
+        INSERT INTO attachments_archive (attachment_id, message_id, file_name, file_size, file_data)
+        SELECT a.attachment_id, a.message_id, a.file_name, a.file_size, a.file_data
+        FROM attachments a JOIN @batch b ON a.message_id = b.message_id;
+
+        DELETE a FROM attachments a JOIN @batch b ON a.message_id = b.message_id;
+        SET @attachments = @@ROWCOUNT;
+
+        INSERT INTO emails_archive (
+            message_id, sender, recipient, subject, body, received_date, size,
+            downloaded_date, processed_date, deleted_date, status, triage_action, archived_date
+        )
+        SELECT e.message_id, e.sender, e.recipient, e.subject, e.body, e.received_date, e.size,
+               e.downloaded_date, e.processed_date, e.deleted_date, e.status, e.triage_action, GETDATE()
+        FROM emails e JOIN @batch b ON e.message_id = b.message_id;
+
+        DELETE e FROM emails e JOIN @batch b ON e.message_id = b.message_id;
+        SET @emails = @@ROWCOUNT;
+
+        SELECT @emails, @attachments;
+    """, (batch_size, days_old))
+    emails_archived, attachments_archived = cursor.fetchone()
+    if emails_archived > 0:
+        logging.info(f"Archived {emails_archived} emails and {attachments_archived} attachments")
+    return emails_archived, attachments_archived
+
+def get_completed_backfill_windows(cursor, since, until):
+    """Get backfill windows already completed within a date range.
+    
+    Args:
+        cursor: Database cursor
+        since (datetime): Range start
+        until (datetime): Range end
+        
+    Returns:
+        list: (window_start, window_end) tuples ordered by window_start
+    """
+    cursor.execute("""
+        SELECT window_start, window_end FROM backfill_windows
+        WHERE window_end > %s AND window_start < %s
+        ORDER BY window_start
+    """, (since, until))
+    return [(row[0], row[1]) for row in cursor.fetchall()]
+
+def record_backfill_window(cursor, window_start, window_end, message_count):
+    """Record a backfill window as completed so it is skipped on resume.
+    
+    Args:
+        cursor: Database cursor
+        window_start (datetime): Window start
+        window_end (datetime): Window end
+        message_count (int): Number of messages found in the window
+    """
+    cursor.execute("""
+        INSERT INTO backfill_windows (window_start, window_end, message_count, completed_date)
+        VALUES (%s, %s, %s, GETDATE())
+    """, (window_start, window_end, message_count))
+    logging.info(f"Completed backfill window {window_start} - {window_end} ({message_count} emails)")
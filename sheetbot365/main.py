@@ -2,9 +2,17 @@
 import sys
 import argparse
 import logging
+from datetime import datetime
 from sheetbot365.config import load_config
 from sheetbot365.utils import setup_logging
-from sheetbot365.commands import cmd_scan, cmd_delete, cmd_status
+from sheetbot365.commands import cmd_scan, cmd_backfill, cmd_delete, cmd_archive, cmd_status
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD command line date."""
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid date '{value}', expected YYYY-MM-DD")
 
 def main():
     """Main entry point for the email automation CLI."""
@@ -20,6 +28,13 @@ def main():
     scan_parser.add_argument('--auto-mark-deleted', action='store_true', help='Automatically mark old processed emails as deleted')
     scan_parser.add_argument('--days-old', type=int, help='Days old threshold for marking as deleted (overrides config)')
     
+    # Backfill command
+    backfill_parser = subparsers.add_parser('backfill', help='Ingest historical emails received between two dates')
+    backfill_parser.add_argument('--since', type=parse_date, required=True, help='Start date (YYYY-MM-DD, inclusive)')
+    backfill_parser.add_argument('--until', type=parse_date, default=datetime.utcnow().strftime('%Y-%m-%d'),
+                      help='End date (YYYY-MM-DD, exclusive, default: today)')
+    backfill_parser.add_argument('--workers', type=int, help='Number of windows to fetch in parallel (overrides config)')
+    
     # Delete command
     delete_parser = subparsers.add_parser('delete', help='Delete emails from database and/or inbox')
     delete_parser.add_argument('--days-old', type=int, required=True, help='Delete emails older than this many days')
@@ -27,6 +42,11 @@ def main():
     delete_parser.add_argument('--email-only', action='store_true', help='Delete only from email inbox')
     delete_parser.add_argument('--both', action='store_true', help='Delete from both database and email inbox')
     
+    # Archive command
+    archive_parser = subparsers.add_parser('archive', help='Move old processed emails to the archive tables')
+    archive_parser.add_argument('--days-old', type=int, help='Archive processed emails received more than this many days ago (overrides config)')
+    archive_parser.add_argument('--batch-size', type=int, help='Number of emails to move per transaction (overrides config)')
+    
     # Status command
     status_parser = subparsers.add_parser('status', help='Show email status counts')
     status_parser.add_argument('-v', '--verbose', action='store_true', help='Show additional statistics')
@@ -48,10 +68,14 @@ def main():
         # Execute command
         if args.command == 'scan':
             cmd_scan(config, args)
+        elif args.command == 'backfill':
+            cmd_backfill(config, args)
         elif args.command == 'delete':
             if not any([args.db_only, args.email_only, args.both]):
                 delete_parser.error("Must specify at least one of --db-only, --email-only, or --both")
             cmd_delete(config, args)
+        elif args.command == 'archive':
+            cmd_archive(config, args)
         elif args.command == 'status':
             cmd_status(config, args)
     except Exception as e:
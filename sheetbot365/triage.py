@@ -0,0 +1,207 @@
+import re
+import logging
+
+TRIAGE_ACTIONS = ('ingest', 'headers', 'skip')
+
+# Listing fields needed to triage a message; the body is fetched separately for ingested mail
+TRIAGE_SELECT = 'id,subject,from,receivedDateTime,hasAttachments,isRead'
+ATTACHMENT_METADATA_EXPAND = 'attachments($select=id,name,contentType,size)'
+
+def get_list_setting(settings, key, name):
+    """Get a list-valued triage setting, rejecting scalars.
+
+    A scalar such as a single regex string would otherwise be iterated
+    character by character and silently match far more mail than intended.
+
+    Args:
+        settings (dict): Rule or attachment settings
+        key (str): Setting name
+        name (str): Rule name used in error messages
+
+    Returns:
+        list: The setting value, or an empty list if unset
+
+    Raises:
+        ValueError: If the setting is present but not a list
+    """
+    value = settings.get(key)
+    if value is None:
+        return []
+    if not isinstance(value, list):
+        raise ValueError(f"Triage setting '{key}' in '{name}' must be a list, got: {value!r}")
+    return value
+
+def compile_attachment_criteria(criteria, name='attachments'):
+    """Compile attachment matching criteria from the config.
+
+    Args:
+        criteria (dict): Keys content_types, extensions, min_size and max_size (all optional)
+        name (str): Rule name used in error messages
+
+    Returns:
+        dict: Normalised criteria, or None if no criteria are set
+
+    Raises:
+        ValueError: If content_types or extensions is not a list
+    """
+    compiled = {
+        'content_types': {t.lower() for t in get_list_setting(criteria, 'content_types', name)},
+        'extensions': {
+            e.lower() if e.startswith('.') else f'.{e.lower()}'
+            for e in get_list_setting(criteria, 'extensions', name)
+        },
+        'min_size': criteria.get('min_size'),
+        'max_size': criteria.get('max_size'),
+    }
+    if not any(compiled.values()):
+        return None
+    return compiled
+
+def attachment_matches(criteria, attachment):
+    """Check if attachment metadata satisfies compiled attachment criteria.
+
+    Args:
+        criteria (dict): Compiled attachment criteria
+        attachment (dict): Attachment object from the API
+
+    Returns:
+        bool: True if the attachment matches every criterion set
+    """
+    name = (attachment.get('name') or '').lower()
+    content_type = (attachment.get('contentType') or '').lower()
+    size = attachment.get('size') or 0
+
+    if criteria['content_types'] and content_type not in criteria['content_types']:
+        return False
+    if criteria['extensions'] and not name.endswith(tuple(criteria['extensions'])):
+        return False
+    if criteria['min_size'] is not None and size < criteria['min_size']:
+        return False
+    if criteria['max_size'] is not None and size > criteria['max_size']:
+        return False
+    return True
+
+def compile_rule(rule):
+    """Compile a single triage rule from the config.
+
+    Args:
+        rule (dict): Rule settings
+
+    Returns:
+        dict: Compiled rule
+
+    Raises:
+        ValueError: If the rule has an unknown action, an invalid regex or a non-list condition
+    """
+    name = rule.get('name', 'unnamed')
+    action = rule.get('action')
+    if action not in TRIAGE_ACTIONS:
+        raise ValueError(f"Triage rule '{name}' has invalid action: {action}")
+
+    try:
+        subject_patterns = [re.compile(p, re.IGNORECASE) for p in get_list_setting(rule, 'subject_regex', name)]
+    except re.error as e:
+        raise ValueError(f"Triage rule '{name}' has invalid subject_regex: {e}")
+
+    return {
+        'name': name,
+        'action': action,
+        'sender_domains': [d.lower().lstrip('@') for d in get_list_setting(rule, 'sender_domains', name)],
+        'subject_patterns': subject_patterns,
+        'has_attachments': rule.get('has_attachments'),
+        'attachment': compile_attachment_criteria({
+            'content_types': get_list_setting(rule, 'attachment_content_types', name),
+            'extensions': get_list_setting(rule, 'attachment_extensions', name),
+            'min_size': rule.get('attachment_min_size'),
+            'max_size': rule.get('attachment_max_size'),
+        }, name),
+    }
+
+def compile_triage(triage_config):
+    """Compile the triage section of the config into rules evaluated per message.
+
+    Args:
+        triage_config (dict): The 'triage' config section, or None
+
+    Returns:
+        dict: Compiled triage settings, or None if triage is not configured
+
+    Raises:
+        ValueError: If the triage section is invalid
+    """
+    if not triage_config:
+        return None
+
+    default_action = triage_config.get('default_action', 'ingest')
+    if default_action not in TRIAGE_ACTIONS:
+        raise ValueError(f"Invalid triage default_action: {default_action}")
+
+    rules = [compile_rule(rule) for rule in get_list_setting(triage_config, 'rules', 'triage')]
+    attachments = compile_attachment_criteria(triage_config.get('attachments') or {})
+    needs_attachment_metadata = attachments is not None or any(rule['attachment'] for rule in rules)
+
+    # Only push a filter down to Graph when everything it excludes would be skipped anyway
+    kept_rules = [rule for rule in rules if rule['action'] != 'skip']
+    listing_filter = None
+    if default_action == 'skip' and kept_rules and all(
+        rule['has_attachments'] is True or rule['attachment'] for rule in kept_rules
+    ):
+        listing_filter = 'hasAttachments eq true'
+
+    return {
+        'default_action': default_action,
+        'rules': rules,
+        'attachments': attachments,
+        'filter': listing_filter,
+        'select': TRIAGE_SELECT,
+        'expand': ATTACHMENT_METADATA_EXPAND if needs_attachment_metadata else None,
+    }
+
+def rule_matches(rule, email):
+    """Check if an email's listing metadata satisfies every condition of a rule.
+
+    Args:
+        rule (dict): Compiled rule
+        email (dict): Email object from the API
+
+    Returns:
+        bool: True if the rule matches
+    """
+    if rule['sender_domains']:
+        sender = email.get('from', {}).get('emailAddress', {}).get('address', '').lower()
+        domain = sender.rsplit('@', 1)[-1]
+        if not any(domain == d or domain.endswith(f'.{d}') for d in rule['sender_domains']):
+            return False
+
+    if rule['subject_patterns']:
+        subject = email.get('subject') or ''
+        if not any(p.search(subject) for p in rule['subject_patterns']):
+            return False
+
+    if rule['has_attachments'] is not None and bool(email.get('hasAttachments')) != rule['has_attachments']:
+        return False
+
+    if rule['attachment']:
+        if not any(attachment_matches(rule['attachment'], a) for a in email.get('attachments', [])):
+            return False
+
+    return True
+
+def triage_email(triage, email):
+    """Decide how an email should be stored, using the first matching rule.
+
+    Args:
+        triage (dict): Compiled triage settings, or None
+        email (dict): Email object from the API
+
+    Returns:
+        str: 'ingest', 'headers' or 'skip'
+    """
+    if triage is None:
+        return 'ingest'
+
+    for rule in triage['rules']:
+        if rule_matches(rule, email):
+            logging.info(f"Triage rule '{rule['name']}' matched: {rule['action']} {email.get('subject', '')}")
+            return rule['action']
+    return triage['default_action']
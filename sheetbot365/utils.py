@@ -67,4 +67,27 @@ def remove_lock(config):
     lock_file = config['paths']['lock_file']
     if os.path.exists(lock_file):
         os.remove(lock_file)
-        logging.info("Removed lock file.")
\ No newline at end of file
+        logging.info("Removed lock file.")
+
+def get_uncovered_ranges(since, until, covered):
+    """Get the parts of a date range not covered by a list of sub-ranges.
+    
+    Args:
+        since (datetime): Range start
+        until (datetime): Range end
+        covered (list): (start, end) tuples ordered by start
+        
+    Returns:
+        list: (start, end) tuples of the uncovered gaps, in order
+    """
+    gaps = []
+    cursor_date = since
+    for start, end in covered:
+        if start > cursor_date:
+            gaps.append((cursor_date, min(start, until)))
+        cursor_date = max(cursor_date, end)
+        if cursor_date >= until:
+            break
+    if cursor_date < until:
+        gaps.append((cursor_date, until))
+    return gaps